@@ -0,0 +1,82 @@
+import heapq
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import DurationField, F
+from django.db.models.expressions import ExpressionWrapper
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+
+def percentile_cont(values, percentile):
+    # Same linear interpolation as PostgreSQL's percentile_cont, on sorted
+    # values.
+    position = (len(values) - 1) * percentile
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower)
+
+
+def delivery_time_percentiles(querysets, bucket):
+    # Returns a list of (bucket, count, {name: seconds}) tuples ordered by
+    # bucket, for the delivered orders in all of `querysets`, e.g. the
+    # current and the archived orders, so that buckets spanning the archive
+    # cutoff aren't split.
+    querysets = [
+        queryset.filter(delivered_at__isnull=False).annotate(
+            bucket=Trunc('delivered_at', bucket))
+        for queryset in querysets]
+    if connection.vendor == 'postgresql':
+        return _delivery_time_percentiles_sql(querysets)
+    # Other databases stream the rows of each queryset ordered by bucket
+    # and merge them, so only one bucket is held in memory at a time.
+    rows = heapq.merge(*(
+        queryset.order_by('bucket').values_list(
+            'bucket', 'created_at', 'delivered_at').iterator()
+        for queryset in querysets), key=itemgetter(0))
+    results = []
+    for bucket_start, bucket_rows in groupby(rows, key=itemgetter(0)):
+        durations = sorted((delivered_at - created_at).total_seconds()
+                           for _, created_at, delivered_at in bucket_rows)
+        results.append((bucket_start, len(durations), {
+            name: percentile_cont(durations, percentile)
+            for name, percentile in PERCENTILES}))
+    return results
+
+
+def _delivery_time_percentiles_sql(querysets):
+    # The ORM can't aggregate over a union, so the percentiles are computed
+    # in SQL over the UNION ALL of the (bucket, duration) rows.
+    duration = ExpressionWrapper(
+        F('delivered_at') - F('created_at'), output_field=DurationField())
+    subqueries = [
+        queryset.annotate(duration=duration).order_by().values_list(
+            'bucket', 'duration').query.sql_with_params()
+        for queryset in querysets]
+    sql = ('SELECT bucket, COUNT(*), {0} FROM ({1}) AS deliveries '
+           'GROUP BY bucket ORDER BY bucket').format(
+        ', '.join('percentile_cont({0}) WITHIN GROUP (ORDER BY duration)'
+                  .format(float(percentile)) for _, percentile in PERCENTILES),
+        ' UNION ALL '.join('({0})'.format(subquery)
+                           for subquery, _ in subqueries))
+    params = [param for _, subquery_params in subqueries
+              for param in subquery_params]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = []
+    for bucket_start, count, *values in rows:
+        # Trunc returns naive datetimes in the current time zone, make them
+        # aware as the ORM would.
+        if settings.USE_TZ:
+            bucket_start = timezone.make_aware(bucket_start)
+        results.append((bucket_start, count, {
+            name: value.total_seconds()
+            for (name, _), value in zip(PERCENTILES, values)}))
+    return results
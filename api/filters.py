@@ -1,12 +1,38 @@
+from django.db.models import Q
 from django_filters import rest_framework as filters
 
-from .models import Order
+from .models import ArchivedOrder, CustomerInfo, Order
 
 
 class OrderFilter(filters.FilterSet):
     customer = filters.UUIDFilter(
         field_name='customer_info__customer')
+    search = filters.CharFilter(method='filter_search')
+    delivered_after = filters.IsoDateTimeFilter(
+        field_name='delivered_at', lookup_expr='gte')
+    delivered_before = filters.IsoDateTimeFilter(
+        field_name='delivered_at', lookup_expr='lt')
 
     class Meta:
         model = Order
-        fields = ('customer', 'status')
+        fields = ('customer', 'status', 'search',
+                  'delivered_after', 'delivered_before')
+
+    def filter_search(self, queryset, name, value):
+        # Each branch of the union only filters on indexed columns, so that
+        # PostgreSQL can use the trigram indexes created in migration 0005:
+        # address and phone are combined with a BitmapOr, and names are
+        # matched on api_customer and joined through the customer foreign
+        # key. ORing a subquery with the other conditions would scan every
+        # customer info instead.
+        customer_infos = CustomerInfo.objects.filter(
+            Q(address__icontains=value) | Q(phone__icontains=value)
+        ).values('id').union(CustomerInfo.objects.filter(
+            customer__name__icontains=value).values('id'))
+        return queryset.filter(customer_info__in=customer_infos)
+
+
+class ArchivedOrderFilter(OrderFilter):
+
+    class Meta(OrderFilter.Meta):
+        model = ArchivedOrder
@@ -0,0 +1,115 @@
+from datetime import timedelta
+import json
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import (Customer, CustomerInfo, KitchenQueueItem, Order,
+                     OrderIntake, Pizza, PizzaDetail, PizzaOrder)
+from .serializers import OrderSerializer
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_order(data):
+    return OrderIntake.objects.create(
+        payload=json.dumps(data, cls=JSONEncoder))
+
+
+@transaction.atomic
+def process_order_intake(batch_size):
+    # Payloads are validated again because the menu may have changed since
+    # they were accepted. Rows locked by another worker are skipped.
+    intakes = list(OrderIntake.objects.select_for_update(
+        skip_locked=True).filter(
+        status=OrderIntake.PENDING_STATUS).order_by(
+        'created_at')[:batch_size])
+    orders_data = []
+    for intake in intakes:
+        serializer = OrderSerializer(data=json.loads(intake.payload))
+        if serializer.is_valid():
+            orders_data.append((intake, serializer.validated_data))
+            intake.status = OrderIntake.COMPLETED_STATUS
+        else:
+            intake.status = OrderIntake.FAILED_STATUS
+            intake.errors = json.dumps(serializer.errors, cls=JSONEncoder)
+        intake.updated_at = timezone.now()
+    try:
+        with transaction.atomic():
+            bulk_create_orders(
+                [(intake.id, data) for intake, data in orders_data])
+    except Exception:
+        # Save the orders one by one so that a single order can't hold back
+        # the rest of the batch, and mark only that one as failed.
+        logger.exception('Saving a batch of orders failed, retrying them '
+                         'one by one.')
+        for intake, data in orders_data:
+            try:
+                with transaction.atomic():
+                    bulk_create_orders([(intake.id, data)])
+            except Exception as error:
+                logger.exception('Saving order %s failed.', intake.id)
+                intake.status = OrderIntake.FAILED_STATUS
+                intake.errors = json.dumps(
+                    {'non_field_errors': [str(error)]}, cls=JSONEncoder)
+    OrderIntake.objects.bulk_update(
+        intakes, ['status', 'errors', 'updated_at'])
+    return len(intakes)
+
+
+def purge_order_intake(days, batch_size):
+    # Completed and failed intakes are only kept for clients to poll.
+    cutoff = timezone.now() - timedelta(days=days)
+    intakes = OrderIntake.objects.filter(
+        status__in=(OrderIntake.COMPLETED_STATUS, OrderIntake.FAILED_STATUS),
+        created_at__lt=cutoff)
+    total = 0
+    while True:
+        ids = list(intakes.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += OrderIntake.objects.filter(id__in=ids).delete()[0]
+
+
+def bulk_create_orders(orders_data):
+    customers = {}
+    customer_infos = {}
+    pizza_ids = set()
+    for _, validated_data in orders_data:
+        customer_data = validated_data['customer_info']
+        name = customer_data['customer']['name']
+        if name not in customers:
+            customers[name], _ = Customer.objects.get_or_create(name=name)
+        key = (name, customer_data['address'], customer_data.get('phone'))
+        if key not in customer_infos:
+            customer_infos[key] = CustomerInfo.objects.upsert(
+                customers[name], key[1], key[2])
+        for pizza_data in validated_data['pizzas']:
+            pizza_ids.add(pizza_data['pizza']['id'])
+    pizzas = Pizza.objects.in_bulk(list(pizza_ids))
+    orders = []
+    pizza_orders = []
+    details = []
+    for order_id, validated_data in orders_data:
+        customer_data = validated_data['customer_info']
+        order = Order(id=order_id, customer_info=customer_infos[(
+            customer_data['customer']['name'], customer_data['address'],
+            customer_data.get('phone'))])
+        orders.append(order)
+        for pizza_data in validated_data['pizzas']:
+            pizza_order = PizzaOrder(
+                pizza=pizzas[pizza_data['pizza']['id']], order=order)
+            pizza_orders.append(pizza_order)
+            for detail_data in pizza_data['details']:
+                details.append(
+                    PizzaDetail(pizza_order=pizza_order, **detail_data))
+    Order.objects.bulk_create(orders)
+    PizzaOrder.objects.bulk_create(pizza_orders)
+    PizzaDetail.objects.bulk_create(details)
+    KitchenQueueItem.objects.add(
+        (detail.pizza_order.pizza_id, detail.size, detail.count)
+        for detail in details)
+    return orders
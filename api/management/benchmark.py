@@ -0,0 +1,32 @@
+from api.intake import bulk_create_orders
+from api.models import Order, Pizza, PizzaDetail
+from api.serializers import OrderSerializer
+from api.utils import uuid7
+
+
+def create_orders(count):
+    # Meant to run inside a transaction that is rolled back afterwards.
+    pizzas = list(Pizza.objects.all()[:5])
+    if not pizzas:
+        pizzas = [Pizza.objects.create(name='Benchmark pizza')]
+    sizes = [size for size, _ in PizzaDetail.SIZE_CHOICES]
+    bulk_create_orders([(uuid7(), {
+        'customer_info': {
+            'customer': {'name': 'Benchmark customer {0}'.format(
+                index % 100)},
+            'address': '{0} Benchmark Street'.format(index % 100),
+            'phone': '555-{0:04d}'.format(index % 100),
+        },
+        'pizzas': [{
+            'pizza': {'id': pizza.id},
+            'details': [{'size': sizes[index % len(sizes)],
+                         'count': 1 + index % 3}],
+        } for pizza in pizzas[:1 + index % len(pizzas)]],
+    }) for index in range(count)])
+
+
+def get_orders_data():
+    orders = Order.objects.select_related(
+        'customer_info__customer').prefetch_related(
+        'pizzas__pizza', 'pizzas__details')
+    return OrderSerializer(orders, many=True).data
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import (ArchivedOrder, ArchivedPizzaDetail,
+                        ArchivedPizzaOrder, Order, PizzaDetail, PizzaOrder)
+
+
+class Command(BaseCommand):
+    help = 'Move delivered orders older than N days to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        while True:
+            archived = self.archive_batch(cutoff, options['batch_size'])
+            if not archived:
+                break
+            total += archived
+        self.stdout.write('Archived {0} orders.'.format(total))
+
+    @transaction.atomic
+    def archive_batch(self, cutoff, batch_size):
+        # Each batch runs in its own short transaction, and rows locked by
+        # concurrent writers are skipped and picked up on a later run.
+        orders = list(Order.objects.select_for_update(skip_locked=True).filter(
+            status=Order.DELIVERED_STATUS,
+            created_at__lt=cutoff).order_by('created_at')[:batch_size])
+        if not orders:
+            return 0
+        pizza_orders = list(PizzaOrder.objects.filter(order__in=orders))
+        details = list(PizzaDetail.objects.filter(
+            pizza_order__in=pizza_orders))
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(id=order.id,
+                          created_at=order.created_at,
+                          updated_at=order.updated_at,
+                          customer_info_id=order.customer_info_id,
+                          status=order.status,
+                          delivered_at=order.delivered_at)
+            for order in orders])
+        ArchivedPizzaOrder.objects.bulk_create([
+            ArchivedPizzaOrder(id=pizza_order.id,
+                               created_at=pizza_order.created_at,
+                               updated_at=pizza_order.updated_at,
+                               pizza_id=pizza_order.pizza_id,
+                               order_id=pizza_order.order_id)
+            for pizza_order in pizza_orders])
+        ArchivedPizzaDetail.objects.bulk_create([
+            ArchivedPizzaDetail(id=detail.id,
+                                created_at=detail.created_at,
+                                updated_at=detail.updated_at,
+                                size=detail.size,
+                                count=detail.count,
+                                pizza_order_id=detail.pizza_order_id)
+            for detail in details])
+        PizzaDetail.objects.filter(id__in=[d.id for d in details]).delete()
+        PizzaOrder.objects.filter(
+            id__in=[p.id for p in pizza_orders]).delete()
+        Order.objects.filter(id__in=[o.id for o in orders]).delete()
+        return len(orders)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.management.benchmark import create_orders, get_orders_data
+from api.middleware import COMPRESSORS, DEFAULT_COMPRESSION_LEVELS
+
+
+class Command(BaseCommand):
+    help = ('Compare response size and CPU time per request of the '
+            'available compressions on a large order list.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # The orders are created in a transaction that is rolled back.
+        with transaction.atomic():
+            create_orders(options['orders'])
+            content = JSONRenderer().render(get_orders_data())
+            transaction.set_rollback(True)
+        self.stdout.write('identity: {0} bytes'.format(len(content)))
+        for encoding, compress in COMPRESSORS:
+            for level in sorted({1, DEFAULT_COMPRESSION_LEVELS[encoding]}):
+                start = time.process_time()
+                for _ in range(options['repeat']):
+                    compressed = compress(content, level)
+                elapsed = (time.process_time() - start) / options['repeat']
+                self.stdout.write(
+                    '{0} level {1}: {2} bytes ({3:.1%}), '
+                    '{4:.2f} ms CPU per request'.format(
+                        encoding, level, len(compressed),
+                        len(compressed) / len(content), elapsed * 1000))
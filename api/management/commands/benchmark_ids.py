@@ -0,0 +1,55 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from api.utils import uuid7
+
+
+GENERATORS = (('uuid4', uuid.uuid4), ('uuid7', uuid7))
+
+
+class Command(BaseCommand):
+    help = ('Compare insert throughput and primary key index size of '
+            'uuid4 and uuid7 keys.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        field = models.UUIDField()
+        for name, generator in GENERATORS:
+            table = 'benchmark_ids_{0}'.format(name)
+            with connection.cursor() as cursor:
+                cursor.execute('CREATE TABLE {0} (id {1} PRIMARY KEY)'.format(
+                    table, field.db_type(connection)))
+                try:
+                    elapsed = self.insert(cursor, table, generator, field,
+                                          options['rows'],
+                                          options['batch_size'])
+                    index_size = self.index_size(cursor, table)
+                finally:
+                    cursor.execute('DROP TABLE {0}'.format(table))
+            self.stdout.write(
+                '{0}: {1:.0f} rows/s, primary key index {2}'.format(
+                    name, options['rows'] / elapsed, index_size))
+
+    def insert(self, cursor, table, generator, field, rows, batch_size):
+        sql = 'INSERT INTO {0} (id) VALUES (%s)'.format(table)
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            with transaction.atomic():
+                cursor.executemany(sql, [
+                    (field.get_db_prep_value(generator(), connection),)
+                    for _ in range(min(batch_size, rows - offset))])
+        return time.perf_counter() - start
+
+    def index_size(self, cursor, table):
+        if connection.vendor != 'postgresql':
+            return 'n/a ({0})'.format(connection.vendor)
+        cursor.execute(
+            'SELECT pg_size_pretty(pg_relation_size(%s))',
+            ['{0}_pkey'.format(table)])
+        return cursor.fetchone()[0]
@@ -0,0 +1,47 @@
+import json
+import time
+
+import msgpack
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.management.benchmark import create_orders, get_orders_data
+from api.parsers import ext_hook
+from api.renderers import MessagePackRenderer
+
+
+class Command(BaseCommand):
+    help = ('Compare payload size and encode/decode time of JSON and '
+            'MessagePack on a large order list.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            create_orders(options['orders'])
+            data = get_orders_data()
+            transaction.set_rollback(True)
+        formats = (
+            ('json', JSONRenderer().render, json.loads),
+            ('msgpack', MessagePackRenderer().render,
+             lambda content: msgpack.unpackb(
+                 content, raw=False, timestamp=3, ext_hook=ext_hook)),
+        )
+        for name, encode, decode in formats:
+            encode_time, content = self.measure(
+                encode, data, options['repeat'])
+            decode_time, _ = self.measure(
+                decode, content, options['repeat'])
+            self.stdout.write(
+                '{0}: {1} bytes, encode {2:.2f} ms, decode {3:.2f} ms'.format(
+                    name, len(content), encode_time * 1000,
+                    decode_time * 1000))
+
+    def measure(self, function, value, repeat):
+        start = time.process_time()
+        for _ in range(repeat):
+            result = function(value)
+        return (time.process_time() - start) / repeat, result
@@ -0,0 +1,70 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Runs in a fresh interpreter for each profile, so that import and setup
+# costs are measured from a cold start.
+SCRIPT = '''
+import json
+import os
+import sys
+import time
+
+start = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[2]
+__import__(sys.argv[1])
+startup = time.perf_counter() - start
+
+from django.test import Client
+
+client = Client(HTTP_HOST='localhost')
+requests, path = int(sys.argv[3]), sys.argv[4]
+start = time.perf_counter()
+client.get(path)
+first_request = time.perf_counter() - start
+start = time.perf_counter()
+for _ in range(requests):
+    client.get(path)
+print(json.dumps({
+    'startup': startup,
+    'first_request': first_request,
+    'request': (time.perf_counter() - start) / requests,
+}))
+'''
+
+DEFAULT_PROFILES = ('config.wsgi:config.settings',
+                    'config.wsgi_production:config.settings_production')
+
+
+class Command(BaseCommand):
+    help = ('Compare cold start time and per request overhead of the '
+            'development and production profiles.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            help='WSGI module and settings module, as wsgi:settings.')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--path', default='/api/stats/throttling/',
+            help='Endpoint to request, one that does not use the database '
+                 'by default.')
+
+    def handle(self, *args, **options):
+        for profile in options['profiles'] or DEFAULT_PROFILES:
+            wsgi_module, settings_module = profile.split(':')
+            output = subprocess.check_output(
+                [sys.executable, '-c', SCRIPT, wsgi_module, settings_module,
+                 str(options['requests']), options['path']],
+                cwd=settings.BASE_DIR)
+            result = json.loads(output.decode().strip().splitlines()[-1])
+            self.stdout.write(
+                '{0}: startup {1:.0f} ms, first request {2:.1f} ms, '
+                '{3:.0f} us per request'.format(
+                    settings_module, result['startup'] * 1000,
+                    result['first_request'] * 1000,
+                    result['request'] * 1000000))
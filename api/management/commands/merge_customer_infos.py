@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.models import ArchivedOrder, CustomerInfo, Order
+from api.utils import merge_duplicate_customer_infos
+
+
+class Command(BaseCommand):
+    help = ('Recompute customer info lookup keys, merge duplicates and '
+            'repoint their orders.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        merged = merge_duplicate_customer_infos(
+            CustomerInfo, [Order, ArchivedOrder],
+            batch_size=options['batch_size'])
+        self.stdout.write('Merged {0} customer infos.'.format(merged))
@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.intake import process_order_intake, purge_order_intake
+
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Persist orders accepted asynchronously, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new orders.')
+        parser.add_argument('--interval', type=float, default=1.0)
+        parser.add_argument(
+            '--keep-days', type=int,
+            help='Delete completed and failed intakes older than this many '
+                 'days, once an hour when looping.')
+
+    def handle(self, *args, **options):
+        purged_at = None
+        while True:
+            if (options['keep_days'] is not None and (
+                    purged_at is None or
+                    time.monotonic() - purged_at > PURGE_INTERVAL)):
+                purged_at = time.monotonic()
+                self.purge(options['keep_days'], options['batch_size'])
+            try:
+                processed = process_order_intake(options['batch_size'])
+            except Exception:
+                if not options['loop']:
+                    raise
+                # Keep the worker running, e.g. while the database is
+                # unavailable.
+                logger.exception('Processing orders failed.')
+                processed = 0
+            if processed:
+                self.stdout.write('Processed {0} orders.'.format(processed))
+            elif not options['loop']:
+                break
+            else:
+                time.sleep(options['interval'])
+
+    def purge(self, days, batch_size):
+        try:
+            purged = purge_order_intake(days, batch_size)
+        except Exception:
+            logger.exception('Purging order intakes failed.')
+            return
+        if purged:
+            self.stdout.write('Purged {0} order intakes.'.format(purged))
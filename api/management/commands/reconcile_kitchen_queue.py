@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.models import KitchenQueueItem
+
+
+class Command(BaseCommand):
+    help = ('Recompute the kitchen queue from the processing orders and '
+            'fix the counts that drifted.')
+
+    def handle(self, *args, **options):
+        changes = KitchenQueueItem.objects.reconcile()
+        for pizza_id, size, old, new in changes:
+            self.stdout.write('{0} {1}: {2} -> {3}'.format(
+                pizza_id, size, old, new))
+        self.stdout.write('Fixed {0} kitchen queue items.'.format(
+            len(changes)))
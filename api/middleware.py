@@ -0,0 +1,162 @@
+import hashlib
+import socket
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.cache import get_max_age, patch_vary_headers
+
+from .throttling import record_throttled
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def compress_gzip(content, level):
+    # wbits=31 writes a gzip header with a zero mtime, so the output is
+    # deterministic and can be cached.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(content) + compressor.flush()
+
+
+def compress_brotli(content, level):
+    return brotli.compress(content, quality=level)
+
+
+def compress_zstd(content, level):
+    return zstandard.ZstdCompressor(level=level).compress(content)
+
+
+DEFAULT_COMPRESSION_LEVELS = {'br': 5, 'zstd': 3, 'gzip': 6}
+
+# Available encodings, in order of preference.
+COMPRESSORS = [('gzip', compress_gzip)]
+if zstandard is not None:
+    COMPRESSORS.insert(0, ('zstd', compress_zstd))
+if brotli is not None:
+    COMPRESSORS.insert(0, ('br', compress_brotli))
+
+
+def get_accepted_encodings(accept_encoding):
+    accepted = set()
+    for item in accept_encoding.split(','):
+        encoding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class LoadSheddingMiddleware:
+    # Rejects requests early, before any session or database work, once
+    # more than API_MAX_CONCURRENT_REQUESTS are in flight on this host.
+    # Requests are counted in the default cache, so that all the worker
+    # processes of the host share the count. The counter expires after
+    # API_SHED_COUNTER_TIMEOUT seconds, so that requests of killed workers,
+    # which are never subtracted, don't count for longer than that.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_concurrent_requests = getattr(
+            settings, 'API_MAX_CONCURRENT_REQUESTS', None)
+        self.retry_after = getattr(settings, 'API_SHED_RETRY_AFTER', 1)
+        self.counter_timeout = getattr(
+            settings, 'API_SHED_COUNTER_TIMEOUT', 60)
+        self.key = 'in_flight_{0}'.format(socket.gethostname())
+
+    @property
+    def in_flight(self):
+        return cache.get(self.key, 0)
+
+    def __call__(self, request):
+        if not self.max_concurrent_requests:
+            return self.get_response(request)
+        in_flight = self.acquire()
+        if in_flight is not None and in_flight > self.max_concurrent_requests:
+            self.release()
+            record_throttled('shed')
+            response = JsonResponse(
+                {'detail': 'Server is overloaded, retry later.'},
+                status=503)
+            response['Retry-After'] = str(self.retry_after)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            if in_flight is not None:
+                self.release()
+
+    def acquire(self):
+        # Returns the number of requests in flight including this one, or
+        # None if it couldn't be counted, in which case it isn't shed.
+        try:
+            cache.add(self.key, 0, self.counter_timeout)
+            return cache.incr(self.key)
+        except Exception:
+            return None
+
+    def release(self):
+        try:
+            cache.decr(self.key)
+        except Exception:
+            pass
+
+
+class CompressionMiddleware:
+    # Compresses responses of at least COMPRESSION_MIN_SIZE bytes with the
+    # best encoding accepted by the client. Compressed bodies of cacheable
+    # responses (max-age > 0) are cached by content, so responses served
+    # from a cache are not compressed again on every request.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.levels = dict(DEFAULT_COMPRESSION_LEVELS,
+                           **getattr(settings, 'COMPRESSION_LEVELS', {}))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or len(response.content) < self.min_size or
+                response.has_header('Content-Encoding')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = get_accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding, compress in COMPRESSORS:
+            if encoding in accepted:
+                break
+        else:
+            return response
+        level = self.levels[encoding]
+        max_age = get_max_age(response)
+        if max_age:
+            key = 'compressed_{0}_{1}_{2}'.format(
+                encoding, level, hashlib.sha1(response.content).hexdigest())
+            content = cache.get(key)
+            if content is None:
+                content = compress(response.content, level)
+                cache.set(key, content, max_age)
+        else:
+            content = compress(response.content, level)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
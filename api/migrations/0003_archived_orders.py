@@ -0,0 +1,69 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_auto_20190920_1701'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('Processing', 'Processing'), ('Delivering', 'Delivering'), ('Delivered', 'Delivered')], default='Delivered', max_length=20)),
+                ('delivered_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPizzaDetail',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('size', models.CharField(choices=[('Small', 'Small'), ('Medium', 'Medium'), ('Large', 'Large')], max_length=20)),
+                ('count', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPizzaOrder',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='api_order_status_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedpizzaorder',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pizzas', to='api.ArchivedOrder'),
+        ),
+        migrations.AddField(
+            model_name='archivedpizzaorder',
+            name='pizza',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Pizza'),
+        ),
+        migrations.AddField(
+            model_name='archivedpizzadetail',
+            name='pizza_order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='details', to='api.ArchivedPizzaOrder'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='customer_info',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='api.CustomerInfo'),
+        ),
+    ]
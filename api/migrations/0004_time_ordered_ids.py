@@ -0,0 +1,44 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:42
+
+import api.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='id',
+            field=models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='customerinfo',
+            name='id',
+            field=models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='id',
+            field=models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='pizza',
+            name='id',
+            field=models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='pizzadetail',
+            name='id',
+            field=models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='pizzaorder',
+            name='id',
+            field=models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = (
+    ('api_customer_name_trgm', 'api_customer', 'name'),
+    ('api_customerinfo_address_trgm', 'api_customerinfo', 'address'),
+    ('api_customerinfo_phone_trgm', 'api_customerinfo', 'phone'),
+)
+
+
+# Trigram GIN indexes on UPPER(column) match the SQL generated by
+# `icontains` on PostgreSQL. Other databases fall back to a table scan.
+# The indexes are built concurrently so that writes to the tables aren't
+# blocked, which can't run inside a transaction.
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        # A failed concurrent build leaves an invalid index behind, drop it
+        # so that it is rebuilt.
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_index JOIN pg_class '
+                'ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = %s AND NOT pg_index.indisvalid',
+                [name])
+            invalid = cursor.fetchone() is not None
+        if invalid:
+            schema_editor.execute(
+                'DROP INDEX CONCURRENTLY IF EXISTS {0}'.format(name))
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS {0} ON {1} '
+            'USING gin (UPPER({2}::text) gin_trgm_ops)'.format(
+                name, table, column))
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS {0}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0004_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
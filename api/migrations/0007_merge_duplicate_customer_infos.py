@@ -0,0 +1,24 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:44
+
+from django.db import migrations
+
+from api.utils import merge_duplicate_customer_infos
+
+
+def merge_customer_infos(apps, schema_editor):
+    merge_duplicate_customer_infos(
+        apps.get_model('api', 'CustomerInfo'),
+        [apps.get_model('api', 'Order'),
+         apps.get_model('api', 'ArchivedOrder')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_customerinfo_lookup_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_customer_infos,
+                             migrations.RunPython.noop),
+    ]
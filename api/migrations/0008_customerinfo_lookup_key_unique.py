@@ -0,0 +1,18 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_merge_duplicate_customer_infos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customerinfo',
+            name='lookup_key',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:45
+
+import api.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_customerinfo_lookup_key_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIntake',
+            fields=[
+                ('id', models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payload', models.TextField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('errors', models.TextField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderintake',
+            index=models.Index(fields=['status', 'created_at'], name='api_intake_status_created_idx'),
+        ),
+    ]
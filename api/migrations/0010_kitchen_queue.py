@@ -0,0 +1,39 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:47
+
+import api.models
+import api.utils
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_kitchen_queue(apps, schema_editor):
+    apps.get_model('api', 'KitchenQueueItem').objects.reconcile()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_order_intake'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KitchenQueueItem',
+            fields=[
+                ('id', models.UUIDField(default=api.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('size', models.CharField(choices=[('Small', 'Small'), ('Medium', 'Medium'), ('Large', 'Large')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('pizza', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Pizza')),
+            ],
+            options={
+                'unique_together': {('pizza', 'size')},
+            },
+            managers=[
+                ('objects', api.models.KitchenQueueManager()),
+            ],
+        ),
+        migrations.RunPython(build_kitchen_queue,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.5 on 2026-10-19 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_kitchen_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='delivered_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='delivered_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+    ]
@@ -1,12 +1,14 @@
-import uuid
+from collections import Counter
 
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
+from .utils import customer_info_lookup_key, uuid7
+
 
 class BaseModel(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -21,10 +23,30 @@ class Customer(BaseModel):
         return self.name
 
 
+class CustomerInfoManager(models.Manager):
+
+    def upsert(self, customer, address, phone=None):
+        lookup_key = customer_info_lookup_key(customer.id, address, phone)
+        customer_info, _ = self.get_or_create(
+            lookup_key=lookup_key,
+            defaults={'customer': customer, 'address': address,
+                      'phone': phone})
+        return customer_info
+
+
 class CustomerInfo(BaseModel):
     address = models.CharField(max_length=200)
     phone = models.CharField(max_length=50, blank=True, null=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    lookup_key = models.CharField(
+        max_length=64, unique=True, null=True, editable=False)
+
+    objects = CustomerInfoManager()
+
+    def save(self, *args, **kwargs):
+        self.lookup_key = customer_info_lookup_key(
+            self.customer_id, self.address, self.phone)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return str(self.customer)
@@ -42,10 +64,14 @@ class Order(BaseModel):
     customer_info = models.ForeignKey(CustomerInfo, on_delete=models.CASCADE)
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=PROCESSING_STATUS)
-    delivered_at = models.DateTimeField(null=True)
+    delivered_at = models.DateTimeField(null=True, db_index=True)
 
     class Meta:
         ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['status', 'created_at'],
+                         name='api_order_status_created_idx'),
+        ]
 
     @property
     def delivered(self):
@@ -66,16 +92,42 @@ class Order(BaseModel):
         return False
 
     def update_status(self, status, commit=True):
-        if self.can_update_status(status):
-            self.status = status
-            if commit:
-                self.save()
+        if not commit:
+            if self.can_update_status(status):
+                self.status = status
+            return
+        with transaction.atomic():
+            # Lock the row and check the transition against its current
+            # status, so that concurrent updates can't move an order back
+            # or take it out of the kitchen queue twice.
+            self.status, self.delivered_at = Order.objects.select_for_update(
+            ).values_list('status', 'delivered_at').get(pk=self.pk)
+            if not self.can_update_status(status):
+                return False
+            current_status, self.status = self.status, status
+            self.save(update_fields=['status', 'delivered_at', 'updated_at'])
+            if (current_status == self.PROCESSING_STATUS and
+                    status != self.PROCESSING_STATUS):
+                KitchenQueueItem.objects.remove(self.pending_pizzas())
+        return True
+
+    def pending_pizzas(self):
+        return PizzaDetail.objects.filter(pizza_order__order=self).values_list(
+            'pizza_order__pizza_id', 'size', 'count')
 
     def save(self, *args, **kwargs):
         if self.status == self.DELIVERED_STATUS and not self.delivered_at:
             self.delivered_at = timezone.now()
         super().save(*args, **kwargs)
 
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        self.status = Order.objects.select_for_update().values_list(
+            'status', flat=True).get(pk=self.pk)
+        if self.status == self.PROCESSING_STATUS:
+            KitchenQueueItem.objects.remove(self.pending_pizzas())
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return 'Order({0}) {1}'.format(self.id, str(self.customer_info))
 
@@ -112,3 +164,142 @@ class PizzaDetail(BaseModel):
 
     def __str__(self):
         return 'Pizza({0} - {1})'.format(self.size, self.count)
+
+
+class KitchenQueueManager(models.Manager):
+    use_in_migrations = True
+
+    def add(self, pizzas, sign=1):
+        # `pizzas` holds (pizza_id, size, count) tuples. Rows are updated
+        # in a fixed order so concurrent transactions don't deadlock.
+        totals = Counter()
+        for pizza_id, size, count in pizzas:
+            totals[(pizza_id, size)] += sign * count
+        for (pizza_id, size), count in sorted(totals.items()):
+            if not count:
+                continue
+            item = self.filter(pizza_id=pizza_id, size=size)
+            if item.update(count=models.F('count') + count):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(pizza_id=pizza_id, size=size, count=count)
+            except IntegrityError:
+                item.update(count=models.F('count') + count)
+
+    def remove(self, pizzas):
+        self.add(pizzas, sign=-1)
+
+    @transaction.atomic
+    def reconcile(self):
+        # Recompute the counts from the processing orders and fix the rows
+        # that drifted. Returns the (pizza_id, size, old, new) changes.
+        pizza_detail_model = self.model._meta.apps.get_model(
+            'api', 'PizzaDetail')
+        items = list(self.select_for_update())
+        expected = {
+            (pizza_id, size): total
+            for pizza_id, size, total in pizza_detail_model.objects.filter(
+                pizza_order__order__status=Order.PROCESSING_STATUS
+            ).values_list('pizza_order__pizza_id', 'size').annotate(
+                total=models.Sum('count')).order_by()}
+        changes = []
+        for item in items:
+            count = expected.pop((item.pizza_id, item.size), 0)
+            if item.count != count:
+                changes.append((item.pizza_id, item.size, item.count, count))
+                item.count = count
+                item.save(update_fields=['count', 'updated_at'])
+        for (pizza_id, size), count in sorted(expected.items()):
+            self.create(pizza_id=pizza_id, size=size, count=count)
+            changes.append((pizza_id, size, 0, count))
+        return changes
+
+
+class KitchenQueueItem(BaseModel):
+    pizza = models.ForeignKey(Pizza, on_delete=models.CASCADE)
+    size = models.CharField(max_length=20, choices=PizzaDetail.SIZE_CHOICES)
+    count = models.IntegerField(default=0)
+
+    objects = KitchenQueueManager()
+
+    class Meta:
+        unique_together = ('pizza', 'size')
+
+    def __str__(self):
+        return '{0} {1} ({2})'.format(self.pizza, self.size, self.count)
+
+
+class OrderIntake(BaseModel):
+    PENDING_STATUS = 'Pending'
+    COMPLETED_STATUS = 'Completed'
+    FAILED_STATUS = 'Failed'
+    STATUS_CHOICES = (
+        (PENDING_STATUS, PENDING_STATUS),
+        (COMPLETED_STATUS, COMPLETED_STATUS),
+        (FAILED_STATUS, FAILED_STATUS),
+    )
+    payload = models.TextField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING_STATUS)
+    errors = models.TextField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'],
+                         name='api_intake_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return 'OrderIntake({0}) {1}'.format(self.id, self.status)
+
+
+# Archived rows keep the ids and timestamps of the rows moved out of the
+# hot tables by the `archive_orders` command, so they don't use BaseModel.
+class ArchivedOrder(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    customer_info = models.ForeignKey(
+        CustomerInfo, related_name='archived_orders',
+        on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=20, choices=Order.STATUS_CHOICES,
+        default=Order.DELIVERED_STATUS)
+    delivered_at = models.DateTimeField(null=True, db_index=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    @property
+    def delivered(self):
+        return True if self.status == Order.DELIVERED_STATUS else False
+
+    def __str__(self):
+        return 'ArchivedOrder({0}) {1}'.format(
+            self.id, str(self.customer_info))
+
+
+class ArchivedPizzaOrder(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    pizza = models.ForeignKey(Pizza, on_delete=models.CASCADE)
+    order = models.ForeignKey(
+        ArchivedOrder, related_name='pizzas', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return '{0} {1}'.format(str(self.order), str(self.pizza))
+
+
+class ArchivedPizzaDetail(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    size = models.CharField(max_length=20, choices=PizzaDetail.SIZE_CHOICES)
+    count = models.PositiveSmallIntegerField()
+    pizza_order = models.ForeignKey(
+        ArchivedPizzaOrder, related_name='details', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return 'Pizza({0} - {1})'.format(self.size, self.count)
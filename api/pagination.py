@@ -0,0 +1,20 @@
+from rest_framework.pagination import LimitOffsetPagination
+
+
+class OrderPagination(LimitOffsetPagination):
+    # Pagination is opt-in with ?limit=, except for searches which are
+    # always paginated.
+    search_limit = 50
+    max_limit = 1000
+
+    def get_limit(self, request):
+        if (self.limit_query_param not in request.query_params and
+                'search' in request.query_params):
+            return self.search_limit
+        return super().get_limit(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Skip the COUNT query of unpaginated requests.
+        if self.get_limit(request) is None:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,25 @@
+import uuid
+
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .renderers import UUID_EXT_TYPE
+
+
+def ext_hook(code, data):
+    if code == UUID_EXT_TYPE:
+        return uuid.UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            # timestamp=3 decodes timestamps as timezone-aware datetimes.
+            return msgpack.unpackb(stream.read(), raw=False, timestamp=3,
+                                   ext_hook=ext_hook)
+        except (TypeError, ValueError) as exc:
+            raise ParseError('MessagePack parse error - %s' % exc)
@@ -1,7 +1,10 @@
+import json
+
+from django.db import transaction
 from rest_framework import serializers
 
-from .models import (Customer, CustomerInfo, Order,
-                     Pizza, PizzaDetail, PizzaOrder)
+from .models import (Customer, CustomerInfo, KitchenQueueItem, Order,
+                     OrderIntake, Pizza, PizzaDetail, PizzaOrder)
 
 
 class CustomerInfoSerializer(serializers.ModelSerializer):
@@ -13,7 +16,8 @@ class CustomerInfoSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'address', 'phone')
 
     def validate(self, data, *args, **kwargs):
-        if self.context['view'].action == 'update':
+        view = self.context.get('view')
+        if view and view.action == 'update':
             if self.parent and self.parent.instance:
                 customer = self.parent.instance.customer_info.customer
                 name = data['customer']['name']
@@ -73,6 +77,14 @@ class OrderSerializer(serializers.ModelSerializer):
                   'delivered', 'delivered_at', 'created_at')
         read_only_fields = ('status', 'delivered',
                             'delivered_at', 'created_at')
+        expandable_fields = ('customer', 'pizzas')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
     def validate(self, data):
         if self.instance:
@@ -90,13 +102,13 @@ class OrderSerializer(serializers.ModelSerializer):
                 {'pizzas': 'Pizzas should be aggregated by id.'})
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         customer_data = validated_data.pop('customer_info')
         customer, _ = Customer.objects.get_or_create(
             name=customer_data['customer']['name'])
         customer_data.pop('customer')
-        customer_info, _ = CustomerInfo.objects.get_or_create(
-            customer=customer, **customer_data)
+        customer_info = CustomerInfo.objects.upsert(customer, **customer_data)
         pizzas_data = validated_data.pop('pizzas')
         order = Order.objects.create(
             customer_info=customer_info, **validated_data)
@@ -106,18 +118,28 @@ class OrderSerializer(serializers.ModelSerializer):
             for detail_data in pizza_data['details']:
                 PizzaDetail.objects.create(
                     pizza_order=pizza_order, **detail_data)
+        KitchenQueueItem.objects.add(order.pending_pizzas())
         return order
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        # Lock the order and check its status again, it may have changed
+        # since it was validated.
+        instance.status = Order.objects.select_for_update().values_list(
+            'status', flat=True).get(pk=instance.pk)
+        if not instance.can_update():
+            raise serializers.ValidationError(
+                {'error': 'Cannot update order.'})
         customer_data = validated_data.pop('customer_info')
         customer = instance.customer_info.customer
         if customer.name != customer_data['customer']['name']:
             customer.name = customer_data['customer']['name']
             customer.save()
-        instance.customer_info.address = customer_data['address']
-        if 'phone' in customer_data:
-            instance.customer_info.phone = customer_data['phone']
-        instance.customer_info.save()
+        instance.customer_info = CustomerInfo.objects.upsert(
+            customer, customer_data['address'],
+            customer_data.get('phone', instance.customer_info.phone))
+        instance.save()
+        old_pizzas = list(instance.pending_pizzas())
         instance.pizzas.all().delete()
         for pizza_data in validated_data['pizzas']:
             pizza = Pizza.objects.get(id=pizza_data['pizza']['id'])
@@ -126,9 +148,34 @@ class OrderSerializer(serializers.ModelSerializer):
             for detail in pizza_data['details']:
                 PizzaDetail.objects.create(pizza_order=pizza_order,
                                            **detail)
+        # Apply the difference in a single pass, so that the queue rows are
+        # always locked in the same order.
+        KitchenQueueItem.objects.add(
+            list(instance.pending_pizzas()) +
+            [(pizza_id, size, -count)
+             for pizza_id, size, count in old_pizzas])
         return instance
 
 
+class KitchenQueueItemSerializer(serializers.ModelSerializer):
+    pizza = PizzaSerializer()
+
+    class Meta:
+        model = KitchenQueueItem
+        fields = ('pizza', 'size', 'count')
+
+
+class OrderIntakeSerializer(serializers.ModelSerializer):
+    errors = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderIntake
+        fields = ('id', 'status', 'errors', 'created_at')
+
+    def get_errors(self, obj):
+        return json.loads(obj.errors) if obj.errors else None
+
+
 class OrderStatusSerializer(serializers.ModelSerializer):
     status = serializers.ChoiceField(
         required=True, choices=Order.STATUS_CHOICES)
@@ -146,5 +193,8 @@ class OrderStatusSerializer(serializers.ModelSerializer):
         return data
 
     def update(self, instance, validated_data):
-        instance.update_status(validated_data['status'])
+        # The status may have changed since it was validated.
+        if not instance.update_status(validated_data['status']):
+            raise serializers.ValidationError(
+                {'error': 'Cannot update order status.'})
         return instance
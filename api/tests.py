@@ -1,9 +1,31 @@
+from datetime import datetime, timedelta
+import gzip
+import hashlib
+from io import StringIO
+import json
+import time
+from unittest import mock
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
-from rest_framework import status
-from rest_framework.test import APITestCase
+from django.utils import timezone
+import msgpack
+from rest_framework import fields, serializers, status
+from rest_framework.test import APISimpleTestCase, APITestCase
 
-from .models import (Customer, CustomerInfo, Order,
-                     Pizza, PizzaDetail, PizzaOrder)
+from . import throttling
+from .middleware import LoadSheddingMiddleware
+from .models import (ArchivedOrder, ArchivedPizzaDetail, ArchivedPizzaOrder,
+                     Customer, CustomerInfo, KitchenQueueItem, Order,
+                     OrderIntake, Pizza, PizzaDetail, PizzaOrder)
+from .parsers import ext_hook
+from .serializers import OrderSerializer
+from .utils import uuid7
 
 
 CUSTOMER1 = {'name': 'Customer1', 'address': 'Address1', 'phone': '1234'}
@@ -15,6 +37,29 @@ PIZZA_NAME2 = 'Chicken'
 NOT_FOUND_UUID = 'ffffffff-ffff-ffff-ffff-ffffffffffff'
 
 
+def create_order(customer_index=1, order_status=None, created_at=None,
+                 delivered_at=None):
+    CUSTOMER = CUSTOMER1 if customer_index == 1 else CUSTOMER2
+    PIZZA_NAME = PIZZA_NAME1 if customer_index == 1 else PIZZA_NAME2
+    customer, _ = Customer.objects.get_or_create(name=CUSTOMER['name'])
+    customer_info, _ = CustomerInfo.objects.get_or_create(
+        address=CUSTOMER['address'],
+        phone=CUSTOMER['phone'],
+        customer=customer)
+    order = Order.objects.create(customer_info=customer_info)
+    if order_status:
+        order.update_status(order_status)
+    dates = {'created_at': created_at, 'delivered_at': delivered_at}
+    dates = {name: value for name, value in dates.items() if value}
+    if dates:
+        Order.objects.filter(id=order.id).update(**dates)
+        order.refresh_from_db()
+    pizza, _ = Pizza.objects.get_or_create(name=PIZZA_NAME)
+    pizza_order = PizzaOrder.objects.create(order=order, pizza=pizza)
+    PizzaDetail.objects.create(**PIZZA_DETAILS1, pizza_order=pizza_order)
+    return order
+
+
 class OrderTestCase(APITestCase):
 
     def _create_order(self, customer_index=1):
@@ -40,6 +85,44 @@ class OrderTestCase(APITestCase):
         self.assertIsInstance(order_data, list)
         self.assertEqual(len(order_data), 2)
 
+    def test_list_orders_with_sparse_fields(self):
+        order = self._create_order()
+        self._create_order(customer_index=2)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('api:orders-list'), {'fields': 'id,status'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order_data = response.json()
+        self.assertEqual(len(order_data), 2)
+        self.assertEqual(set(order_data[0]), {'id', 'status'})
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('api:orders-detail', args=(str(order.id),)),
+                {'fields': 'id', 'expand': 'customer'})
+        order_data = response.json()
+        self.assertEqual(set(order_data), {'id', 'customer'})
+        self.assertEqual(order_data['customer']['name'], CUSTOMER1['name'])
+        response = self.client.get(
+            reverse('api:orders-list'), {'fields': ''})
+        self.assertEqual(response.json(),
+                         self.client.get(reverse('api:orders-list')).json())
+        response = self.client.get(
+            reverse('api:orders-list'), {'expand': 'pizzas'})
+        order_data = response.json()
+        self.assertEqual(set(order_data[0]), {
+            'id', 'pizzas', 'status', 'delivered', 'delivered_at',
+            'created_at'})
+        self.assertEqual(order_data[0]['pizzas'][0]['details'],
+                         [PIZZA_DETAILS1])
+
+    def test_list_orders_with_unknown_fields(self):
+        response = self.client.get(
+            reverse('api:orders-list'), {'fields': 'id,unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            reverse('api:orders-list'), {'expand': 'status'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_filter_list_orders(self):
         order1 = self._create_order()
         order2 = self._create_order(customer_index=2)
@@ -60,6 +143,24 @@ class OrderTestCase(APITestCase):
         self.assertEqual(len(order_data), 1)
         self.assertEqual(order_data[0]['id'], str(order1.id))
 
+    def test_search_orders(self):
+        order1 = self._create_order()
+        order2 = self._create_order(customer_index=2)
+        for search, order in (('customer1', order1), ('ADDRESS2', order2),
+                              ('567', order2)):
+            response = self.client.get(
+                reverse('api:orders-list'), {'search': search})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            order_data = response.json()
+            self.assertEqual(order_data['count'], 1)
+            self.assertEqual(order_data['results'][0]['id'], str(order.id))
+        response = self.client.get(
+            reverse('api:orders-list'), {'search': 'Customer', 'limit': 1})
+        order_data = response.json()
+        self.assertEqual(order_data['count'], 2)
+        self.assertEqual(len(order_data['results']), 1)
+        self.assertIsNotNone(order_data['next'])
+
     def test_create_order_success(self):
         pizza = Pizza.objects.create(name=PIZZA_NAME1)
         response = self.client.post(reverse('api:orders-list'), {
@@ -126,6 +227,38 @@ class OrderTestCase(APITestCase):
         self.assertEqual(Customer.objects.count(), 1)
         self.assertEqual(CustomerInfo.objects.count(), 1)
 
+    def test_create_two_orders_with_same_normalized_customer_info(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        for customer in (CUSTOMER1, dict(CUSTOMER1, address=' address1  ')):
+            response = self.client.post(reverse('api:orders-list'), {
+                'customer': customer,
+                'pizzas': [{'id': pizza.id, 'details': [PIZZA_DETAILS1]}]
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(CustomerInfo.objects.count(), 1)
+        self.assertEqual(CustomerInfo.objects.get().address,
+                         CUSTOMER1['address'])
+
+    def test_merge_duplicate_customer_infos(self):
+        customer = Customer.objects.create(name=CUSTOMER1['name'])
+        customer_infos = CustomerInfo.objects.bulk_create([
+            CustomerInfo(customer=customer, address='Address1', phone='12-34'),
+            CustomerInfo(customer=customer, address='ADDRESS1', phone='1234'),
+            CustomerInfo(customer=customer, address='Address2', phone='1234'),
+        ])
+        for customer_info in customer_infos:
+            Order.objects.create(customer_info=customer_info)
+        call_command('merge_customer_infos', stdout=StringIO())
+        self.assertEqual(CustomerInfo.objects.count(), 2)
+        self.assertFalse(
+            CustomerInfo.objects.filter(lookup_key__isnull=True).exists())
+        survivor = CustomerInfo.objects.exclude(id=customer_infos[2].id).get()
+        self.assertEqual(
+            Order.objects.filter(customer_info=survivor).count(), 2)
+        self.assertEqual(Order.objects.filter(
+            customer_info=customer_infos[2]).count(), 1)
+
     def test_create_two_orders_with_two_customers(self):
         pizza = Pizza.objects.create(name=PIZZA_NAME1)
         response = self.client.post(reverse('api:orders-list'), {
@@ -303,6 +436,14 @@ class OrderStatusTestCase(APITestCase):
         self.assertTrue(order.delivered)
         self.assertIsNotNone(order.delivered_at)
 
+    def test_cannot_change_status_of_stale_order_to_prior_status(self):
+        stale = self._create_order()
+        Order.objects.get(id=stale.id).update_status(Order.DELIVERED_STATUS)
+        self.assertFalse(stale.update_status(Order.DELIVERING_STATUS))
+        order = Order.objects.get(id=stale.id)
+        self.assertEqual(order.status, Order.DELIVERED_STATUS)
+        self.assertIsNotNone(order.delivered_at)
+
     def test_cannot_change_status_to_prior_status(self):
         order = self._create_order()
         order.status = Order.DELIVERING_STATUS
@@ -312,3 +453,529 @@ class OrderStatusTestCase(APITestCase):
             'status': Order.PROCESSING_STATUS
         }, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ArchiveOrdersTestCase(APITestCase):
+
+    def test_archive_old_delivered_orders(self):
+        created_at = timezone.now() - timedelta(days=40)
+        old = create_order(order_status=Order.DELIVERED_STATUS,
+                           created_at=created_at)
+        recent = create_order(order_status=Order.DELIVERED_STATUS)
+        processing = create_order(created_at=created_at)
+        call_command('archive_orders', days=30, batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)),
+            {recent.id, processing.id})
+        archived = ArchivedOrder.objects.get()
+        self.assertEqual(archived.id, old.id)
+        self.assertEqual(archived.customer_info, old.customer_info)
+        self.assertEqual(archived.delivered_at, old.delivered_at)
+        self.assertEqual(ArchivedPizzaOrder.objects.count(), 1)
+        self.assertEqual(ArchivedPizzaDetail.objects.count(), 1)
+        self.assertEqual(PizzaOrder.objects.count(), 2)
+        self.assertEqual(PizzaDetail.objects.count(), 2)
+
+    def test_list_and_retrieve_archived_orders(self):
+        created_at = timezone.now() - timedelta(days=40)
+        order1 = create_order(
+            order_status=Order.DELIVERED_STATUS, created_at=created_at)
+        order2 = create_order(
+            customer_index=2, order_status=Order.DELIVERED_STATUS,
+            created_at=created_at)
+        call_command('archive_orders', stdout=StringIO())
+        response = self.client.get(reverse('api:orders-list'))
+        self.assertEqual(response.json(), [])
+        response = self.client.get(
+            reverse('api:orders-list'), {'archived': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 2)
+        customer_id = str(order2.customer_info.customer.id)
+        response = self.client.get(
+            reverse('api:orders-list'),
+            {'archived': 'true', 'customer': customer_id})
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(response.json()[0]['id'], str(order2.id))
+        response = self.client.get(
+            reverse('api:orders-detail', args=(str(order1.id),)),
+            {'archived': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order_data = response.json()
+        self.assertEqual(order_data['status'], Order.DELIVERED_STATUS)
+        self.assertEqual(order_data['pizzas'][0]['details'], [PIZZA_DETAILS1])
+        response = self.client.get(
+            reverse('api:orders-detail', args=(str(order1.id),)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class UUID7TestCase(APISimpleTestCase):
+
+    def test_uuid7_layout(self):
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertAlmostEqual(value.int >> 80, time.time() * 1000, delta=1000)
+
+    def test_uuid7_is_time_ordered(self):
+        first = uuid7()
+        time.sleep(0.002)
+        self.assertLess(first, uuid7())
+
+
+class OrderIntakeTestCase(APITestCase):
+
+    def _enqueue_order(self, pizza, customer=CUSTOMER1):
+        return self.client.post(reverse('api:orders-list'), {
+            'customer': customer,
+            'pizzas': [{'id': pizza.id, 'details': [PIZZA_DETAILS1]}]
+        }, format='json', HTTP_PREFER='respond-async')
+
+    def test_enqueue_and_process_orders(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        response = self._enqueue_order(pizza)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        intake_data = response.json()
+        self.assertEqual(intake_data['status'], OrderIntake.PENDING_STATUS)
+        self.assertEqual(Order.objects.count(), 0)
+        self._enqueue_order(pizza, customer=CUSTOMER2)
+        self._enqueue_order(pizza)
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['status'],
+                         OrderIntake.PENDING_STATUS)
+        call_command('process_order_intake', batch_size=2,
+                     stdout=StringIO())
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertEqual(CustomerInfo.objects.count(), 2)
+        self.assertEqual(PizzaDetail.objects.count(), 3)
+        response = self.client.get(
+            reverse('api:order-intake', args=(intake_data['id'],)))
+        self.assertEqual(response.json()['status'],
+                         OrderIntake.COMPLETED_STATUS)
+        response = self.client.get(
+            reverse('api:orders-detail', args=(intake_data['id'],)))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order_data = response.json()
+        self.assertEqual(order_data['customer']['name'], CUSTOMER1['name'])
+        self.assertEqual(order_data['pizzas'][0]['details'], [PIZZA_DETAILS1])
+
+    def test_enqueue_order_with_other_preferences(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        response = self.client.post(reverse('api:orders-list'), {
+            'customer': CUSTOMER1,
+            'pizzas': [{'id': pizza.id, 'details': [PIZZA_DETAILS1]}]
+        }, format='json', HTTP_PREFER='return=minimal, Respond-Async; wait=5')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_purge_finished_intakes(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        intake_ids = [self._enqueue_order(pizza).json()['id']
+                      for _ in range(4)]
+        OrderIntake.objects.filter(id__in=intake_ids[:2]).update(
+            status=OrderIntake.COMPLETED_STATUS)
+        OrderIntake.objects.filter(id=intake_ids[1]).update(
+            status=OrderIntake.FAILED_STATUS)
+        OrderIntake.objects.exclude(id=intake_ids[2]).update(
+            created_at=timezone.now() - timedelta(days=10))
+        call_command('process_order_intake', keep_days=7, batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(
+            set(OrderIntake.objects.values_list('id', flat=True)),
+            {uuid.UUID(intake_id) for intake_id in intake_ids[2:]})
+
+    def test_enqueue_invalid_order(self):
+        response = self.client.post(reverse('api:orders-list'), {
+            'customer': CUSTOMER1, 'pizzas': []
+        }, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(OrderIntake.objects.count(), 0)
+
+    def test_process_order_with_removed_pizza(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        intake_id = self._enqueue_order(pizza).json()['id']
+        pizza.delete()
+        call_command('process_order_intake', stdout=StringIO())
+        self.assertEqual(Order.objects.count(), 0)
+        response = self.client.get(
+            reverse('api:order-intake', args=(intake_id,)))
+        intake_data = response.json()
+        self.assertEqual(intake_data['status'], OrderIntake.FAILED_STATUS)
+        self.assertIn('pizzas', intake_data['errors'])
+
+    def test_process_orders_with_pizza_removed_while_saving(self):
+        pizza1 = Pizza.objects.create(name=PIZZA_NAME1)
+        pizza2 = Pizza.objects.create(name=PIZZA_NAME2)
+        intake_id1 = self._enqueue_order(pizza1).json()['id']
+        intake_id2 = self._enqueue_order(pizza2).json()['id']
+        in_bulk = Pizza.objects.in_bulk
+
+        def in_bulk_without_pizza2(id_list):
+            pizzas = in_bulk(id_list)
+            pizzas.pop(pizza2.id, None)
+            return pizzas
+
+        with mock.patch.object(Pizza.objects, 'in_bulk',
+                               in_bulk_without_pizza2), \
+                self.assertLogs('api.intake', 'ERROR'):
+            call_command('process_order_intake', stdout=StringIO())
+        self.assertEqual(
+            list(Order.objects.values_list('id', flat=True)),
+            [uuid.UUID(intake_id1)])
+        self.assertEqual(
+            OrderIntake.objects.get(id=intake_id1).status,
+            OrderIntake.COMPLETED_STATUS)
+        self.assertEqual(
+            OrderIntake.objects.get(id=intake_id2).status,
+            OrderIntake.FAILED_STATUS)
+        self.assertEqual(OrderIntake.objects.filter(
+            status=OrderIntake.PENDING_STATUS).count(), 0)
+
+
+class KitchenQueueTestCase(APITestCase):
+
+    def _post_order(self, pizza, details):
+        response = self.client.post(reverse('api:orders-list'), {
+            'customer': CUSTOMER1,
+            'pizzas': [{'id': pizza.id, 'details': details}]
+        }, format='json')
+        return response.json()['id']
+
+    def _get_queue(self):
+        response = self.client.get(reverse('api:kitchen-queue'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {(item['pizza']['name'], item['size']): item['count']
+                for item in response.json()}
+
+    def test_kitchen_queue(self):
+        pizza1 = Pizza.objects.create(name=PIZZA_NAME1)
+        pizza2 = Pizza.objects.create(name=PIZZA_NAME2)
+        order_id = self._post_order(pizza1, [PIZZA_DETAILS1])
+        self._post_order(pizza1, [PIZZA_DETAILS1, PIZZA_DETAILS2])
+        self.assertEqual(self._get_queue(), {
+            (PIZZA_NAME1, 'Small'): 6, (PIZZA_NAME1, 'Large'): 2})
+        self.client.put(reverse('api:orders-detail', args=(order_id,)), {
+            'customer': CUSTOMER1,
+            'pizzas': [{'id': pizza2.id, 'details': [PIZZA_DETAILS2]}]
+        }, format='json')
+        self.assertEqual(self._get_queue(), {
+            (PIZZA_NAME1, 'Small'): 3, (PIZZA_NAME1, 'Large'): 2,
+            (PIZZA_NAME2, 'Large'): 2})
+        self.client.put(reverse('api:order-status', args=(order_id,)), {
+            'status': Order.DELIVERING_STATUS
+        }, format='json')
+        self.client.put(reverse('api:order-status', args=(order_id,)), {
+            'status': Order.DELIVERED_STATUS
+        }, format='json')
+        self.assertEqual(self._get_queue(), {
+            (PIZZA_NAME1, 'Small'): 3, (PIZZA_NAME1, 'Large'): 2})
+        order = Order.objects.exclude(id=order_id).get()
+        self.client.delete(reverse('api:orders-detail', args=(order.id,)))
+        self.assertEqual(self._get_queue(), {})
+
+    def test_update_order_after_status_changed(self):
+        pizza1 = Pizza.objects.create(name=PIZZA_NAME1)
+        pizza2 = Pizza.objects.create(name=PIZZA_NAME2)
+        order_id = self._post_order(pizza1, [PIZZA_DETAILS1])
+        order = Order.objects.get(id=order_id)
+        Order.objects.get(id=order.id).update_status(Order.DELIVERING_STATUS)
+        serializer = OrderSerializer(order, data={
+            'customer': CUSTOMER1,
+            'pizzas': [{'id': pizza2.id, 'details': [PIZZA_DETAILS2]}]})
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        self.assertEqual(self._get_queue(), {})
+
+    def test_reconcile_kitchen_queue(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        self._post_order(pizza, [PIZZA_DETAILS1])
+        KitchenQueueItem.objects.all().delete()
+        KitchenQueueItem.objects.create(pizza=pizza, size='Large', count=4)
+        call_command('reconcile_kitchen_queue', stdout=StringIO())
+        self.assertEqual(self._get_queue(), {(PIZZA_NAME1, 'Small'): 3})
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {
+    'reads': '2/minute', 'order_writes': '1/minute'}})
+class ThrottlingTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_throttle_reads_per_client(self):
+        for _ in range(2):
+            response = self.client.get(reverse('api:pizzas-list'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('api:orders-list'))
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        response = self.client.get(reverse('api:pizzas-list'),
+                                   REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('api:throttle-stats'))
+        self.assertEqual(response.json()['reads'], 1)
+
+    def test_throttle_writes_separately_from_reads(self):
+        response = self.client.post(reverse('api:orders-list'), {
+            'customer': CUSTOMER1, 'pizzas': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('api:orders-list'), {
+            'customer': CUSTOMER1, 'pizzas': []}, format='json')
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.get(reverse('api:orders-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(API_MAX_CONCURRENT_REQUESTS=2)
+    def test_shed_load_across_worker_processes(self):
+        # Each worker process has its own middleware instance, and they
+        # share the count through the cache.
+        busy = []
+        responses = []
+
+        def get_response(request):
+            # Keeps this worker busy while the next one gets a request.
+            busy.append(request)
+            if len(busy) < len(workers):
+                responses.append(
+                    workers[len(busy)](RequestFactory().get('/api/')))
+            return HttpResponse()
+
+        workers = [LoadSheddingMiddleware(get_response) for _ in range(3)]
+        response = workers[0](RequestFactory().get('/api/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([response.status_code for response in responses],
+                         [status.HTTP_503_SERVICE_UNAVAILABLE,
+                          status.HTTP_200_OK])
+        self.assertEqual(workers[0].in_flight, 0)
+
+    @mock.patch.object(throttling, 'LOCAL_CACHE_MAX_ENTRIES', 2)
+    @mock.patch.dict(throttling._local_cache, clear=True)
+    def test_fall_back_to_local_buckets_when_cache_fails(self):
+        with mock.patch.object(throttling.TokenBucketThrottle, 'consume',
+                               side_effect=ConnectionError):
+            for address in ('10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.3'):
+                response = self.client.get(reverse('api:orders-list'),
+                                           REMOTE_ADDR=address)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(throttling._local_cache), 2)
+            response = self.client.get(reverse('api:orders-list'),
+                                       REMOTE_ADDR='10.0.0.3')
+            self.assertEqual(response.status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(API_MAX_CONCURRENT_REQUESTS=1)
+    def test_shed_load_over_max_concurrent_requests(self):
+        responses = []
+
+        def get_response(request):
+            responses.append(middleware(request))
+            return HttpResponse()
+
+        middleware = LoadSheddingMiddleware(get_response)
+        response = middleware(RequestFactory().get('/api/orders/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[0].status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(responses[0]['Retry-After'], '1')
+        self.assertEqual(middleware.in_flight, 0)
+        response = self.client.get(reverse('api:throttle-stats'))
+        self.assertEqual(response.json()['shed'], 1)
+
+
+class CompressionTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_compress_large_responses(self):
+        for index in range(100):
+            Pizza.objects.create(name='Pizza{0}'.format(index))
+        response = self.client.get(reverse('api:pizzas-list'),
+                                   HTTP_ACCEPT_ENCODING='deflate, gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+        content = gzip.decompress(response.content)
+        self.assertEqual(len(json.loads(content.decode())), 100)
+        key = 'compressed_gzip_6_{0}'.format(
+            hashlib.sha1(content).hexdigest())
+        self.assertEqual(cache.get(key), response.content)
+        response = self.client.get(reverse('api:pizzas-list'),
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.json()), 100)
+
+    def test_do_not_compress_small_responses(self):
+        Pizza.objects.create(name=PIZZA_NAME1)
+        response = self.client.get(reverse('api:pizzas-list'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.json()), 1)
+
+
+class MessagePackTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def _unpack(self, response):
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        return msgpack.unpackb(response.content, raw=False, timestamp=3,
+                               ext_hook=ext_hook)
+
+    def _to_json(self, data):
+        if isinstance(data, dict):
+            return {key: self._to_json(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self._to_json(item) for item in data]
+        if isinstance(data, uuid.UUID):
+            return str(data)
+        if isinstance(data, datetime):
+            return serializers.DateTimeField().to_representation(data)
+        return data
+
+    def test_create_and_list_orders(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        response = self.client.post(
+            reverse('api:orders-list'),
+            msgpack.packb({
+                'customer': CUSTOMER1,
+                'pizzas': [{
+                    'id': msgpack.ExtType(1, pizza.id.bytes),
+                    'details': [PIZZA_DETAILS1]
+                }]
+            }),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order_data = self._unpack(response)
+        self.assertIsInstance(order_data['id'], uuid.UUID)
+        self.assertIsInstance(order_data['created_at'], datetime)
+        self.assertEqual(order_data['pizzas'][0]['id'], pizza.id)
+        response = self.client.get(reverse('api:orders-list'),
+                                   HTTP_ACCEPT='application/msgpack')
+        msgpack_data = self._unpack(response)
+        response = self.client.get(reverse('api:orders-list'))
+        self.assertEqual(self._to_json(msgpack_data), response.json())
+
+    def test_update_order_status(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        order_id = self.client.post(reverse('api:orders-list'), {
+            'customer': CUSTOMER1,
+            'pizzas': [{'id': pizza.id, 'details': [PIZZA_DETAILS1]}]
+        }, format='json').json()['id']
+        response = self.client.put(
+            reverse('api:order-status', args=(order_id,)),
+            msgpack.packb({'status': Order.DELIVERED_STATUS}),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order_data = self._unpack(response)
+        self.assertTrue(order_data['delivered'])
+        self.assertIsInstance(order_data['delivered_at'], datetime)
+
+    def test_invalid_payload(self):
+        response = self.client.post(
+            reverse('api:orders-list'), b'\xc1',
+            content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('api:orders-list'),
+            msgpack.packb({'customer': CUSTOMER1, 'pizzas': []}),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pizzas', self._unpack(response))
+
+    def test_list_pizzas(self):
+        pizza = Pizza.objects.create(name=PIZZA_NAME1)
+        response = self.client.get(reverse('api:pizzas-list'),
+                                   HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(self._unpack(response),
+                         [{'id': pizza.id, 'name': PIZZA_NAME1}])
+        response = self.client.get(reverse('api:pizzas-list'))
+        self.assertEqual(response.json(),
+                         [{'id': str(pizza.id), 'name': PIZZA_NAME1}])
+
+
+class BenchmarkStartupTestCase(APISimpleTestCase):
+
+    def test_benchmark_startup(self):
+        out = StringIO()
+        call_command('benchmark_startup', '--profile',
+                     'config.wsgi:{0}'.format(settings.SETTINGS_MODULE),
+                     '--requests', '1', stdout=out)
+        self.assertRegex(out.getvalue(), r'startup \d+ ms')
+
+
+class DeliveryTimesTestCase(APITestCase):
+
+    def setUp(self):
+        self.day = timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0) - timedelta(days=2)
+        for hour, minutes in ((10, 10), (10, 20), (12, 30), (12, 40)):
+            created_at = self.day + timedelta(hours=hour)
+            order = create_order(
+                order_status=Order.DELIVERED_STATUS, created_at=created_at,
+                delivered_at=created_at + timedelta(minutes=minutes))
+        self.customer_info1 = order.customer_info
+        created_at = self.day + timedelta(days=1, hours=10)
+        create_order(
+            customer_index=2, order_status=Order.DELIVERED_STATUS,
+            created_at=created_at,
+            delivered_at=created_at + timedelta(minutes=60))
+        create_order()
+
+    def test_delivery_times_by_day(self):
+        response = self.client.get(
+            reverse('api:orders-delivery-times'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]['bucket'],
+                         fields.DateTimeField().to_representation(self.day))
+        self.assertEqual(data[0]['count'], 4)
+        self.assertAlmostEqual(data[0]['p50'], 1500)
+        self.assertAlmostEqual(data[0]['p90'], 2220)
+        self.assertAlmostEqual(data[0]['p99'], 2382)
+        self.assertEqual(data[1]['count'], 1)
+        self.assertAlmostEqual(data[1]['p99'], 3600)
+
+    def test_delivery_times_by_hour_and_customer(self):
+        response = self.client.get(
+            reverse('api:orders-delivery-times'), {
+                'bucket': 'hour',
+                'customer': str(self.customer_info1.customer.id)})
+        data = response.json()
+        self.assertEqual([item['count'] for item in data], [2, 2])
+        self.assertAlmostEqual(data[0]['p50'], 900)
+        self.assertAlmostEqual(data[1]['p50'], 2100)
+        response = self.client.get(
+            reverse('api:orders-delivery-times'),
+            {'delivered_after': (self.day + timedelta(days=1)).isoformat()})
+        self.assertEqual([item['count'] for item in response.json()], [1])
+
+    def test_delivery_times_include_archived_orders(self):
+        created_at = self.day - timedelta(days=40)
+        create_order(
+            order_status=Order.DELIVERED_STATUS, created_at=created_at,
+            delivered_at=self.day + timedelta(hours=11))
+        call_command('archive_orders', stdout=StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
+        response = self.client.get(
+            reverse('api:orders-delivery-times'))
+        data = response.json()
+        self.assertEqual([item['count'] for item in data], [5, 1])
+        self.assertAlmostEqual(data[0]['p50'], 1800)
+
+    def test_delivery_times_with_invalid_bucket(self):
+        response = self.client.get(
+            reverse('api:orders-delivery-times'), {'bucket': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
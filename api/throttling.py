@@ -0,0 +1,180 @@
+from collections import OrderedDict
+import threading
+import time
+
+from django.core.cache import cache as default_cache, caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+try:
+    from django_redis.cache import RedisCache
+except ImportError:
+    RedisCache = None
+
+
+THROTTLED_CACHE_KEY = 'throttled_{0}'
+THROTTLED_SCOPES = ('reads', 'order_writes', 'status_writes', 'shed')
+
+# Refills the bucket and takes a token in a single step on the Redis
+# server, so that concurrent requests from all workers see each other.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local duration = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(
+    capacity,
+    tokens + math.max(0, now - updated_at) * capacity / duration)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens),
+           'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(duration))
+return {allowed, tostring(tokens)}
+"""
+
+# Used when the shared cache is unavailable, so that throttling keeps
+# working per process instead of failing the requests. Entries expire, and
+# the least recently used ones are dropped beyond the maximum.
+LOCAL_CACHE_MAX_ENTRIES = 10000
+_local_cache = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _local_get(key, default=None):
+    # Callers hold _local_lock.
+    value, expires_at = _local_cache.get(key, (default, None))
+    if expires_at is not None and expires_at < time.time():
+        del _local_cache[key]
+        return default
+    return value
+
+
+def _local_set(key, value, timeout=None):
+    # Callers hold _local_lock.
+    expires_at = None if timeout is None else time.time() + timeout
+    _local_cache[key] = (value, expires_at)
+    _local_cache.move_to_end(key)
+    while len(_local_cache) > LOCAL_CACHE_MAX_ENTRIES:
+        _local_cache.popitem(last=False)
+
+
+def _cache_get(cache, key, default=None):
+    try:
+        return cache.get(key, default)
+    except Exception:
+        with _local_lock:
+            return _local_get(key, default)
+
+
+def record_throttled(scope):
+    key = THROTTLED_CACHE_KEY.format(scope)
+    try:
+        default_cache.add(key, 0, None)
+        default_cache.incr(key)
+    except Exception:
+        with _local_lock:
+            _local_set(key, _local_get(key, 0) + 1)
+
+
+def get_throttled_counts():
+    return {scope: _cache_get(default_cache,
+                              THROTTLED_CACHE_KEY.format(scope), 0)
+            for scope in THROTTLED_SCOPES}
+
+
+def take_token(bucket, now, capacity, duration):
+    # Returns whether a token was taken and the tokens left in the bucket.
+    tokens, updated_at = bucket or (capacity, now)
+    tokens = min(capacity,
+                 tokens + max(0, now - updated_at) * capacity / duration)
+    if tokens < 1:
+        return False, tokens
+    return True, tokens - 1
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    # A bucket holds up to `num_requests` tokens and refills at
+    # `num_requests / duration` tokens per second, so clients can burst up
+    # to the bucket size but not sustain more than the rate.
+    methods = None
+
+    def get_rate(self):
+        # Read the rates on each request so that they follow the settings.
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if self.methods is not None and request.method not in self.methods:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        try:
+            allowed, self.tokens = self.consume()
+        except Exception:
+            allowed, self.tokens = self.consume_local()
+        if not allowed:
+            record_throttled(self.scope)
+            return False
+        return True
+
+    def consume(self):
+        # self.cache is a proxy, look up the backend it points to.
+        cache = caches['default']
+        if RedisCache is not None and isinstance(cache, RedisCache):
+            client = cache.client.get_client(write=True)
+            script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, tokens = script(
+                keys=[cache.make_key(self.key)],
+                args=[self.num_requests, self.now, self.duration])
+            return bool(allowed), float(tokens)
+        # Other caches can't update the bucket atomically across processes,
+        # so this is only atomic within the process, e.g. with the local
+        # memory cache.
+        with _local_lock:
+            allowed, tokens = take_token(
+                cache.get(self.key), self.now, self.num_requests,
+                self.duration)
+            cache.set(self.key, (tokens, self.now), self.duration)
+        return allowed, tokens
+
+    def consume_local(self):
+        with _local_lock:
+            allowed, tokens = take_token(
+                _local_get(self.key), self.now, self.num_requests,
+                self.duration)
+            _local_set(self.key, (tokens, self.now), self.duration)
+        return allowed, tokens
+
+    def wait(self):
+        return (1 - self.tokens) * self.duration / self.num_requests
+
+
+class ReadThrottle(TokenBucketThrottle):
+    scope = 'reads'
+    methods = SAFE_METHODS
+
+
+class OrderWriteThrottle(TokenBucketThrottle):
+    scope = 'order_writes'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class StatusWriteThrottle(TokenBucketThrottle):
+    scope = 'status_writes'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
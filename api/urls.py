@@ -11,6 +11,12 @@ router.register(r'orders', views.OrderViewSet, basename='orders')
 router.register(r'pizzas', views.PizzaViewSet, basename='pizzas')
 
 urlpatterns = router.urls + [
+    path('stats/throttling/',
+         views.ThrottleStatsView.as_view(), name='throttle-stats'),
+    path('kitchen/queue/',
+         views.KitchenQueueView.as_view(), name='kitchen-queue'),
+    path('orders/intake/<uuid:pk>/',
+         views.OrderIntakeView.as_view(), name='order-intake'),
     path('orders/<uuid:pk>/status/',
          views.OrderStatusView.as_view(), name='order-status')
 ]
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import time
+import uuid
+
+from django.db import transaction
+
+
+def uuid7():
+    # Time-ordered UUID (version 7 layout): 48 bits of Unix time in
+    # milliseconds followed by 74 random bits, so new keys are appended to
+    # the right edge of B-tree indexes instead of landing on random pages.
+    timestamp = time.time_ns() // 1000000
+    random = int.from_bytes(os.urandom(10), 'big')
+    value = (timestamp & 0xffffffffffff) << 80
+    value |= 0x7 << 76
+    value |= (random >> 62 & 0xfff) << 64
+    value |= 0x2 << 62
+    value |= random & 0x3fffffffffffffff
+    return uuid.UUID(int=value)
+
+
+def customer_info_lookup_key(customer_id, address, phone):
+    address = ' '.join(address.split()).casefold()
+    phone = ''.join(c for c in phone or '' if c.isdigit())
+    value = '{0}\n{1}\n{2}'.format(customer_id, address, phone)
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def merge_duplicate_customer_infos(customer_info_model, order_models,
+                                   batch_size=500):
+    # Works with the historical models of migrations too, so the models
+    # are passed in. All infos of a customer share a batch, and keys only
+    # collide within a customer, so batches can be handled independently.
+    merged = 0
+    last_customer_id = None
+    while True:
+        customer_ids = customer_info_model.objects.order_by(
+            'customer_id').values_list('customer_id', flat=True).distinct()
+        if last_customer_id is not None:
+            customer_ids = customer_ids.filter(
+                customer_id__gt=last_customer_id)
+        customer_ids = list(customer_ids[:batch_size])
+        if not customer_ids:
+            return merged
+        last_customer_id = customer_ids[-1]
+        survivors = {}
+        duplicates = {}
+        changed = []
+        for customer_info in customer_info_model.objects.filter(
+                customer_id__in=customer_ids).order_by('created_at', 'id'):
+            key = customer_info_lookup_key(
+                customer_info.customer_id, customer_info.address,
+                customer_info.phone)
+            if key in survivors:
+                duplicates[customer_info.id] = survivors[key].id
+                continue
+            survivors[key] = customer_info
+            if customer_info.lookup_key != key:
+                customer_info.lookup_key = key
+                changed.append(customer_info)
+        with transaction.atomic():
+            for duplicate_id, survivor_id in duplicates.items():
+                for order_model in order_models:
+                    order_model.objects.filter(
+                        customer_info_id=duplicate_id).update(
+                        customer_info_id=survivor_id)
+            customer_info_model.objects.filter(
+                id__in=list(duplicates)).delete()
+            customer_info_model.objects.filter(
+                id__in=[c.id for c in changed]).update(lookup_key=None)
+            customer_info_model.objects.bulk_update(changed, ['lookup_key'])
+        merged += len(duplicates)
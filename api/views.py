@@ -1,30 +1,201 @@
+import re
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics, mixins, status, viewsets
+from django_filters.utils import translate_validation
+from rest_framework import (exceptions, fields, generics, mixins, status,
+                            viewsets)
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from .filters import OrderFilter
-from .models import Order, Pizza
-from .serializers import (OrderSerializer, OrderStatusSerializer,
+from .analytics import delivery_time_percentiles
+from .filters import ArchivedOrderFilter, OrderFilter
+from .intake import enqueue_order
+from .models import (ArchivedOrder, KitchenQueueItem, Order, OrderIntake,
+                     Pizza)
+from .pagination import OrderPagination
+from .parsers import MessagePackParser
+from .renderers import MessagePackRenderer
+from .serializers import (KitchenQueueItemSerializer, OrderIntakeSerializer,
+                          OrderSerializer, OrderStatusSerializer,
                           PizzaSerializer)
+from .throttling import (OrderWriteThrottle, ReadThrottle,
+                         StatusWriteThrottle, get_throttled_counts)
+
+
+RENDERER_CLASSES = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (
+    MessagePackRenderer,)
+PARSER_CLASSES = tuple(api_settings.DEFAULT_PARSER_CLASSES) + (
+    MessagePackParser,)
+
+
+def prefers_async(request):
+    # Prefer holds comma separated preferences with optional parameters
+    # after semicolons, e.g. `respond-async, wait=5`.
+    preferences = re.split(r'[,;]', request.META.get('HTTP_PREFER', ''))
+    return 'respond-async' in (
+        preference.strip().lower() for preference in preferences)
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.select_related(
         'customer_info__customer').prefetch_related(
         'pizzas__pizza').prefetch_related('pizzas__details')
+    archived_queryset = ArchivedOrder.objects.select_related(
+        'customer_info__customer').prefetch_related(
+        'pizzas__pizza').prefetch_related('pizzas__details')
     serializer_class = OrderSerializer
     filter_backends = (DjangoFilterBackend,)
-    filterset_class = OrderFilter
+    pagination_class = OrderPagination
+    throttle_classes = (ReadThrottle, OrderWriteThrottle)
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    # Columns each serializer field reads, used to trim sparse queries.
+    field_columns = {
+        'id': ('id',),
+        'customer': ('customer_info__address', 'customer_info__phone',
+                     'customer_info__customer__name'),
+        'pizzas': (),
+        'status': ('status',),
+        'delivered': ('status',),
+        'delivered_at': ('delivered_at',),
+        'created_at': ('created_at',),
+    }
+
+    @property
+    def archived(self):
+        # Archived orders are read-only, so only reads may ask for them.
+        return (self.action in ('list', 'retrieve') and
+                self.request.query_params.get('archived') == 'true')
+
+    @property
+    def filterset_class(self):
+        return ArchivedOrderFilter if self.archived else OrderFilter
+
+    def get_requested_fields(self):
+        if self.action not in ('list', 'retrieve'):
+            return None
+        fields = self.request.query_params.get('fields')
+        expand = self.request.query_params.get('expand')
+        if fields is not None:
+            # An empty list is the same as no `fields` parameter.
+            fields = set(filter(None, fields.split(','))) or None
+        if fields is None and expand is None:
+            return None
+        meta = self.serializer_class.Meta
+        if fields is not None:
+            requested = fields
+        else:
+            requested = set(meta.fields) - set(meta.expandable_fields)
+        unknown = requested - set(meta.fields)
+        if expand is not None:
+            expanded = set(filter(None, expand.split(',')))
+            unknown |= expanded - set(meta.expandable_fields)
+            requested |= expanded
+        if unknown:
+            raise exceptions.ValidationError(
+                {'fields': 'Unknown fields: {0}.'.format(
+                    ', '.join(sorted(unknown)))})
+        return requested
+
+    def get_queryset(self):
+        if self.archived:
+            queryset = self.archived_queryset.all()
+        else:
+            queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if 'customer' in fields:
+            queryset = queryset.select_related('customer_info__customer')
+        if 'pizzas' in fields:
+            queryset = queryset.prefetch_related(
+                'pizzas__pizza', 'pizzas__details')
+        columns = {'id'}
+        for field in fields:
+            columns.update(self.field_columns[field])
+        return queryset.only(*columns)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
+
+    def create(self, request, *args, **kwargs):
+        if not (settings.ORDER_INTAKE_ASYNC or prefers_async(request)):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        intake = enqueue_order(request.data)
+        location = reverse('api:order-intake', args=(intake.id,))
+        return Response(OrderIntakeSerializer(intake).data,
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+    @action(detail=False, url_path='delivery-times')
+    def delivery_times(self, request):
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in ('hour', 'day'):
+            raise exceptions.ValidationError(
+                {'bucket': 'Must be hour or day.'})
+        # Current and archived orders are analyzed together, so that months
+        # of data are covered whatever the archive cutoff.
+        querysets = []
+        for filterset_class, queryset in (
+                (OrderFilter, Order.objects.all()),
+                (ArchivedOrderFilter, ArchivedOrder.objects.all())):
+            filterset = filterset_class(
+                request.query_params, queryset=queryset, request=request)
+            if not filterset.is_valid():
+                raise translate_validation(filterset.errors)
+            querysets.append(filterset.qs)
+        datetime_field = fields.DateTimeField()
+        return Response([
+            dict(bucket=datetime_field.to_representation(bucket_start),
+                 count=count, **percentiles)
+            for bucket_start, count, percentiles in delivery_time_percentiles(
+                querysets, bucket)])
 
     def partial_update(self, request, pk):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class OrderIntakeView(generics.RetrieveAPIView):
+    queryset = OrderIntake.objects.all()
+    serializer_class = OrderIntakeSerializer
+    throttle_classes = (ReadThrottle,)
+
+
 class OrderStatusView(generics.RetrieveUpdateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderStatusSerializer
+    throttle_classes = (ReadThrottle, StatusWriteThrottle)
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
 
 
+@method_decorator(cache_page(settings.PIZZA_CACHE_TIMEOUT), name='list')
 class PizzaViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = Pizza.objects.all()
     serializer_class = PizzaSerializer
+    throttle_classes = (ReadThrottle,)
+    renderer_classes = RENDERER_CLASSES
+
+
+class KitchenQueueView(generics.ListAPIView):
+    queryset = KitchenQueueItem.objects.filter(count__gt=0).select_related(
+        'pizza').order_by('pizza__name', 'size')
+    serializer_class = KitchenQueueItemSerializer
+    throttle_classes = (ReadThrottle,)
+
+
+class ThrottleStatsView(APIView):
+
+    def get(self, request):
+        return Response(get_throttled_counts())
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.LoadSheddingMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -125,3 +127,54 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # Token bucket sizes per client, refilled over the period.
+    'DEFAULT_THROTTLE_RATES': {
+        'reads': '1200/minute',
+        'order_writes': '300/minute',
+        'status_writes': '600/minute',
+    },
+}
+
+
+# Load shedding
+# Requests beyond this many in flight per host get a 503 response. They are
+# counted in the default cache, which is per process unless it is shared.
+
+API_MAX_CONCURRENT_REQUESTS = 64
+
+API_SHED_RETRY_AFTER = 1
+
+# Seconds after which the count is reset, longer than any request.
+API_SHED_COUNTER_TIMEOUT = 60
+
+
+# Response compression
+# Responses smaller than COMPRESSION_MIN_SIZE bytes are sent as is. Brotli
+# and Zstandard are used when the brotli and zstandard packages are
+# installed, gzip otherwise.
+
+COMPRESSION_MIN_SIZE = 1024
+
+COMPRESSION_LEVELS = {
+    'br': 5,
+    'zstd': 3,
+    'gzip': 6,
+}
+
+# Seconds the pizza list is cached for.
+
+PIZZA_CACHE_TIMEOUT = 300
+
+
+# Order intake
+# Accept new orders into a queue and persist them with the
+# process_order_intake command. Clients can also opt in per request with
+# the `Prefer: respond-async` header.
+
+ORDER_INTAKE_ASYNC = False
@@ -0,0 +1,94 @@
+"""
+Production settings for config project.
+
+The API is stateless, so this profile drops the admin, sessions, messages,
+static files and template stack, and the middleware that supports them.
+
+Run it with gunicorn, see gunicorn.conf.py.
+"""
+
+import multiprocessing
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, REST_FRAMEWORK
+
+
+SECRET_KEY = os.environ.get('SECRET_KEY', SECRET_KEY)  # noqa: F405
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '*').split(',')
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'django_filters',
+    'api.apps.ApiConfig',
+]
+
+MIDDLEWARE = [
+    'api.middleware.LoadSheddingMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+WSGI_APPLICATION = 'config.wsgi_production.application'
+
+
+# Database
+# Keep connections open between requests, each worker opens its own
+# connection after forking.
+
+DATABASES['default']['CONN_MAX_AGE'] = 60
+
+
+# Cache
+# Shared by all workers, so that throttling buckets are per client rather
+# than per process. Errors are ignored so that cached views keep working
+# while Redis is down, throttling then falls back to per process buckets.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://redis:6379/0'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+}
+
+
+# Load shedding
+# Gunicorn's sync workers run one request each, and the cache is shared by
+# the workers of the host. With one fewer than the number of workers, the
+# spare worker answers 503 right away while the others are busy, instead
+# of requests waiting in gunicorn's backlog.
+
+API_MAX_CONCURRENT_REQUESTS = int(os.environ.get(
+    'API_MAX_CONCURRENT_REQUESTS',
+    max(1, int(os.environ.get(
+        'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)) - 1)))
+
+
+# Password validation
+
+AUTH_PASSWORD_VALIDATORS = []
+
+
+# Django REST framework
+# No authentication, and JSON only since the browsable API needs templates.
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_RENDERER_CLASSES=('rest_framework.renderers.JSONRenderer',),
+    DEFAULT_AUTHENTICATION_CLASSES=(),
+    DEFAULT_PERMISSION_CLASSES=('rest_framework.permissions.AllowAny',),
+    UNAUTHENTICATED_USER=None,
+)
@@ -0,0 +1,32 @@
+from django.db import DatabaseError, connections
+from django.urls import get_resolver, reverse
+
+
+def warm_up():
+    # Runs once in the gunicorn master before the workers are forked, so
+    # that they share the populated URL resolver. Serializers build their
+    # fields again for every instance, building them once here only fills
+    # the model _meta caches and imports they rely on.
+    from api import serializers
+    resolver = get_resolver()
+    for name in ('orders-list', 'pizzas-list', 'kitchen-queue'):
+        reverse('api:{0}'.format(name))
+    resolver.resolve('/api/orders/')
+    for serializer_class in (serializers.OrderSerializer,
+                             serializers.OrderStatusSerializer,
+                             serializers.OrderIntakeSerializer,
+                             serializers.KitchenQueueItemSerializer,
+                             serializers.PizzaSerializer):
+        serializer_class().fields
+
+
+def warm_up_connections():
+    # Database connections can't be shared across processes, so each
+    # worker opens its own after forking. Connections are per thread, which
+    # with sync workers is also the one that handles the requests.
+    # If the database is unavailable, the first request will retry.
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            pass
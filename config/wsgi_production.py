@@ -0,0 +1,18 @@
+"""
+WSGI config for config project, with the production settings.
+
+The application is warmed up when this module is imported, which with
+gunicorn's `preload_app` happens once in the master process.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_production')
+
+application = get_wsgi_application()
+
+from .warmup import warm_up  # noqa: E402
+
+warm_up()
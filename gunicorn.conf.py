@@ -0,0 +1,22 @@
+import multiprocessing
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Sync workers handle one request at a time on the main thread, the one
+# whose database connection is opened in post_fork. Connections beyond
+# what the workers keep up with wait in the backlog, or are refused when
+# it is full.
+worker_class = 'sync'
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 256))
+# Load the application in the master process, so that workers are forked
+# with Django already set up and warmed up.
+preload_app = True
+max_requests = 10000
+max_requests_jitter = 1000
+
+
+def post_fork(server, worker):
+    from config.warmup import warm_up_connections
+    warm_up_connections()